@@ -1,94 +1,61 @@
+import asyncio
+import http.cookiejar
+import logging
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+import cachetools
+import httpx
+import orjson
 import requests
-from pydantic import BaseModel, ValidationError
-
-# test comments
-# --- 1. Define the OpenAPI Specification (as a Python dictionary) ---
-# This is a simplified representation of what you'd find in a real openapi.json file.
-# It defines the expected request and response structures for our LLM endpoint.
-openapi_spec = {
-    "openapi": "3.0.0",
-    "info": {"title": "Simple LLM API", "version": "1.0.0"},
-    "paths": {
-        "/v1/chat/completions": {
-            "post": {
-                "summary": "Create a chat completion",
-                "requestBody": {
-                    "content": {"application/json": {"schema": {"$ref": "#/components/schemas/ChatCompletionRequest"}}}
-                },
-                "responses": {
-                    "200": {
-                        "description": "Successful response",
-                        "content": {
-                            "application/json": {"schema": {"$ref": "#/components/schemas/ChatCompletionResponse"}}
-                        },
-                    }
-                },
-            }
-        }
-    },
-    "components": {
-        "schemas": {
-            "ChatCompletionRequest": {
-                "type": "object",
-                "properties": {
-                    "model": {"type": "string"},
-                    "messages": {
-                        "type": "array",
-                        "items": {
-                            "type": "object",
-                            "properties": {"role": {"type": "string"}, "content": {"type": "string"}},
-                        },
-                    },
-                },
-                "required": ["model", "messages"],
-            },
-            "ChatCompletionResponse": {
-                "type": "object",
-                "properties": {
-                    "id": {"type": "string"},
-                    "object": {"type": "string"},
-                    "created": {"type": "integer"},
-                    "model": {"type": "string"},
-                    "choices": {
-                        "type": "array",
-                        "items": {
-                            "type": "object",
-                            "properties": {
-                                "index": {"type": "integer"},
-                                "message": {
-                                    "type": "object",
-                                    "properties": {"role": {"type": "string"}, "content": {"type": "string"}},
-                                },
-                            },
-                        },
-                    },
-                },
-            },
-        }
-    },
-}
-
-# --- 2. Define Pydantic Models for Data Validation ---
-# These models are created based on the schemas in our OpenAPI spec.
+from pydantic import BaseModel, ConfigDict, TypeAdapter, ValidationError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from llm_client.openapi import get_openapi_spec
+
+logger = logging.getLogger(__name__)
+
+
+def __getattr__(name: str) -> Any:
+    # openapi_spec used to be a module-level dict; keep it importable without building it on import
+    if name == "openapi_spec":
+        return get_openapi_spec()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")  # noqa: TRY003
+
+
+# --- 1. Define Pydantic Models for Data Validation ---
+# These models are created based on the schemas in our OpenAPI spec (see llm_client.openapi).
 # They ensure that the data we send and receive is in the correct format.
 
 
 class Message(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     role: str
     content: str
 
 
 class ChatCompletionRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     model: str
     messages: list[Message]
+    stream: Optional[bool] = None
 
 
 class ResponseChoice(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     index: int
     message: Message
 
 
 class ChatCompletionResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     id: str
     object: str
     created: int
@@ -96,7 +63,105 @@ class ChatCompletionResponse(BaseModel):
     choices: list[ResponseChoice]
 
 
-# --- 3. Create the LLM Client ---
+class MessageDelta(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    role: Optional[str] = None
+    content: Optional[str] = None
+
+
+class StreamChoice(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    index: int
+    delta: MessageDelta
+    finish_reason: Optional[str] = None
+
+
+class ChatCompletionChunk(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    id: str
+    object: str
+    created: int
+    model: str
+    choices: list[StreamChoice]
+
+
+# Built once at import so each call reuses the compiled validator and serializer
+_REQUEST_ADAPTER = TypeAdapter(ChatCompletionRequest)
+
+_COMPLETIONS_ENDPOINT = "/v1/chat/completions"
+
+
+def _model_fields(obj: Any) -> dict[str, Any]:
+    # orjson calls this for values it cannot serialize itself, i.e. the Message models
+    if isinstance(obj, BaseModel):
+        return obj.__dict__
+    raise TypeError(type(obj).__name__)
+
+
+def _build_payload(model: str, messages: list[Message], stream: bool = False, validate: bool = False) -> bytes:
+    """
+    Builds a chat completion request and serializes it to the JSON body sent to the API.
+
+    Shared by the sync and async clients so both send exactly the same payload. The body is returned
+    as UTF-8 bytes, so the transports write it to the socket as-is without another encoding pass.
+    """
+    fields: dict[str, Any] = {"model": model, "messages": messages}
+    if stream:
+        fields["stream"] = True
+    if validate:
+        request_data = _REQUEST_ADAPTER.validate_python(fields)
+        return _REQUEST_ADAPTER.dump_json(request_data, exclude_none=True, exclude_unset=True)
+    # Message instances were validated when they were created, so the fields can be written out as they are
+    return orjson.dumps(fields, default=_model_fields)
+
+
+def _create_session(pool_maxsize: int, max_retries: int) -> requests.Session:
+    """
+    Creates a requests session with a pooled adapter that retries rate-limited and unavailable responses.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=0.5,
+        # A timed-out POST may still be generating, and re-sending it would bill it again. That rules out read
+        # errors and the gateway errors 502/504, which a proxy returns while the upstream may still be working.
+        status_forcelist=[429, 500, 503],
+        read=False,
+        allowed_methods=["POST"],
+        respect_retry_after_header=True,
+        raise_on_status=False,  # Hand the last response back so raise_for_status reports it
+    )
+    adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Process-wide session for clients created with shared_session=True, built by the first one that needs it
+_shared_session: Optional[requests.Session] = None
+_shared_session_lock = threading.Lock()
+
+
+def _get_shared_session(pool_maxsize: int, max_retries: int) -> requests.Session:
+    """
+    Returns the process-wide session, creating it on first use.
+    """
+    global _shared_session
+    session = _shared_session
+    if session is not None:
+        return session
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = _create_session(pool_maxsize, max_retries)
+            # One cookie jar would replay cookies set for one API key on requests made with another
+            _shared_session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+        return _shared_session
+
+
+# --- 2. Create the LLM Client ---
 
 
 class LLMClient:
@@ -104,43 +169,344 @@ class LLMClient:
     A simple client for interacting with an LLM API that follows our defined OpenAPI spec.
     """
 
-    def __init__(self, base_url: str, api_key: str):
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 200.0,
+        pool_maxsize: int = 16,
+        max_retries: int = 3,
+        cache_size: int = 0,
+        shared_session: bool = False,
+    ):
         """
         Initializes the client with the API's base URL and an API key.
+
+        Args:
+            base_url: The base URL of the LLM API.
+            api_key: The API key sent as a bearer token.
+            connect_timeout: Seconds to wait for a connection to the API to be established.
+            read_timeout: Seconds to wait for the API to send the response.
+            pool_maxsize: Connections kept open per host. Raise it when calling the client from more threads.
+            max_retries: Retries for rate-limited (429), failed (500) or unavailable (503) responses, with exponential
+                backoff that honors the Retry-After header. Use 0 to disable.
+            cache_size: Responses kept in memory for identical (model, messages) requests, so repeated
+                prompts skip the network round trip. Off (0) by default: with the cache on, a repeated prompt
+                returns the same cached reply instead of a new sample from the model.
+            shared_session: Send requests through one process-wide connection pool instead of a pool per client.
+                Useful when many short-lived clients talk to the same host. The first client to use it sets
+                pool_maxsize and max_retries for all, and it never stores cookies, so no state leaks between
+                API keys. Release it with LLMClient.close_shared_session().
         """
         self.base_url = base_url
         self.headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        self._completions_url = f"{base_url.rstrip('/')}{_COMPLETIONS_ENDPOINT}"
+        self._timeout = (connect_timeout, read_timeout)
+        # A session keeps the TCP/TLS connection alive between calls to the same host
+        self._shared_session_config = (pool_maxsize, max_retries)
+        if shared_session:
+            # Other clients use the shared session with their own API keys, so the headers go with each request
+            self._own_session: Optional[requests.Session] = None
+            self._request_headers: Optional[dict[str, str]] = self.headers
+        else:
+            self._own_session = _create_session(pool_maxsize, max_retries)
+            self._own_session.headers.update(self.headers)
+            self._request_headers = None
+        self._cache: Optional[cachetools.LRUCache] = cachetools.LRUCache(maxsize=cache_size) if cache_size else None
+        self._cache_lock = threading.Lock()
 
-    def get_completion(self, model: str, messages: list[Message]) -> ChatCompletionResponse:
+    @property
+    def _session(self) -> requests.Session:
+        # Shared clients look the session up on every call, so they pick up a new one after close_shared_session()
+        if self._own_session is not None:
+            return self._own_session
+        return _get_shared_session(*self._shared_session_config)
+
+    def get_completion(self, model: str, messages: list[Message], validate: bool = False) -> ChatCompletionResponse:
         """
         Sends a request to the LLM to get a chat completion.
 
         Args:
             model: The name of the model to use for the completion.
             messages: A list of message dictionaries, each with a 'role' and 'content'.
+            validate: Validate the messages before sending. Only needed when they are passed as raw
+                dictionaries; Message instances are already valid.
 
         Returns:
             A ChatCompletionResponse object with the LLM's reply.
         """
-        endpoint = "/v1/chat/completions"
-        url = f"{self.base_url}{endpoint}"
+        try:
+            # Build the request body, validating it first if asked to
+            payload = _build_payload(model, messages, validate=validate)
+
+            # Identical requests serialize to identical bytes, so the payload doubles as the cache key.
+            # The cache holds the response body rather than the model: a model's lists can still be mutated
+            # in place, so every caller gets a freshly validated copy instead of a shared instance.
+            content: Optional[bytes] = None
+            if self._cache is not None:
+                with self._cache_lock:
+                    content = self._cache.get(payload)
 
+            # Make the API call, then parse and validate the response bytes in a single pass
+            fetched = content is None
+            if content is None:
+                content = self._post(payload)
+            completion = ChatCompletionResponse.model_validate_json(content)
+
+        except ValidationError:
+            logger.exception("Data validation error")
+            raise
+        except requests.exceptions.RequestException:
+            logger.exception("HTTP request failed")
+            raise
+
+        if fetched and self._cache is not None:
+            with self._cache_lock:
+                self._cache[payload] = content
+        return completion
+
+    def get_completion_raw(self, model: str, messages: list[Message], validate: bool = False) -> bytes:
+        """
+        Sends a request to the LLM and returns the response body without parsing or validating it.
+
+        Meant for callers that only store, log or forward the JSON; bypasses the response cache.
+
+        Args:
+            model: The name of the model to use for the completion.
+            messages: A list of message dictionaries, each with a 'role' and 'content'.
+            validate: Validate the messages before sending. Only needed when they are passed as raw
+                dictionaries; Message instances are already valid.
+
+        Returns:
+            The raw JSON bytes of the API's response.
+        """
         try:
-            # Validate the request data before sending
-            request_data = ChatCompletionRequest(model=model, messages=messages)
-            payload = request_data.model_dump()
+            # Build the request body, validating it first if asked to
+            payload = _build_payload(model, messages, validate=validate)
 
             # Make the API call
-            response = requests.post(url, headers=self.headers, json=payload, timeout=200)
+            return self._post(payload)
+
+        except ValidationError:
+            logger.exception("Data validation error")
+            raise
+        except requests.exceptions.RequestException:
+            logger.exception("HTTP request failed")
+            raise
+
+    def stream_completion(
+        self, model: str, messages: list[Message], validate: bool = False
+    ) -> Iterator[ChatCompletionChunk]:
+        """
+        Sends a streaming request to the LLM and yields the reply piece by piece as it arrives.
+
+        Args:
+            model: The name of the model to use for the completion.
+            messages: A list of message dictionaries, each with a 'role' and 'content'.
+            validate: Validate the messages before sending. Only needed when they are passed as raw
+                dictionaries; Message instances are already valid.
+
+        Yields:
+            ChatCompletionChunk objects whose choices carry the next delta of the reply.
+        """
+        try:
+            # Build the request body, validating it first if asked to
+            payload = _build_payload(model, messages, stream=True, validate=validate)
+
+            # Make the API call without buffering the body
+            with self._session.post(
+                self._completions_url, data=payload, headers=self._request_headers, timeout=self._timeout, stream=True
+            ) as response:
+                response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+
+                # Server-sent events: every chunk is a "data: {...}" line and "data: [DONE]" ends the stream
+                for line in response.iter_lines():
+                    if not line.startswith(b"data:"):
+                        continue
+                    data = line[len(b"data:") :].strip()
+                    if data == b"[DONE]":
+                        break
+                    yield ChatCompletionChunk.model_validate_json(data)
+
+        except ValidationError:
+            logger.exception("Data validation error")
+            raise
+        except requests.exceptions.RequestException:
+            logger.exception("HTTP request failed")
+            raise
+
+    def get_completions(
+        self, batch: list[tuple[str, list[Message]]], concurrency: int = 8
+    ) -> list[ChatCompletionResponse]:
+        """
+        Sends several completion requests concurrently from a thread pool.
+
+        The threads share the client's session, so keep concurrency at or below pool_maxsize
+        to let every request reuse a pooled connection.
+
+        Args:
+            batch: A list of (model, messages) pairs, one per completion.
+            concurrency: The maximum number of requests in flight at the same time.
+
+        Returns:
+            The ChatCompletionResponse objects, in the same order as the batch.
+        """
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(lambda args: self.get_completion(*args), batch))
+
+    def _post(self, payload: bytes) -> bytes:
+        """
+        Sends a request body to the completions endpoint and returns the raw response body.
+        """
+        response = self._session.post(
+            self._completions_url, data=payload, headers=self._request_headers, timeout=self._timeout
+        )
+        response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+        return response.content
+
+    def cache_clear(self) -> None:
+        """
+        Drops all cached responses, so the next call of each request goes to the API again.
+        """
+        if self._cache is not None:
+            with self._cache_lock:
+                self._cache.clear()
+
+    def close(self) -> None:
+        """
+        Closes the underlying HTTP session and its pooled connections.
+
+        The process-wide session is left open for the other clients; see close_shared_session().
+        """
+        if self._own_session is not None:
+            self._own_session.close()
+
+    @classmethod
+    def close_shared_session(cls) -> None:
+        """
+        Closes the process-wide session used by clients created with shared_session=True.
+
+        Call it at process teardown. Shared clients that send another request afterwards start a new shared session.
+        """
+        global _shared_session
+        with _shared_session_lock:
+            if _shared_session is not None:
+                _shared_session.close()
+                _shared_session = None
+
+    def __enter__(self) -> "LLMClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+# --- 3. Create the async LLM Client ---
+
+
+class AsyncLLMClient:
+    """
+    An asyncio counterpart to LLMClient, so many in-flight requests can share one event loop.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 200.0,
+        http2: bool = False,
+    ):
+        """
+        Initializes the client with the API's base URL and an API key.
+
+        Args:
+            base_url: The base URL of the LLM API.
+            api_key: The API key sent as a bearer token.
+            connect_timeout: Seconds to wait for a connection to the API to be established.
+            read_timeout: Seconds to wait for the API to send the response.
+            http2: Multiplex concurrent requests over a single HTTP/2 connection when the server supports it,
+                instead of opening one connection per request. Requires the 'http2' extra.
+        """
+        self.base_url = base_url
+        self.headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=self.headers,
+            http2=http2,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        )
+
+    async def get_completion(
+        self, model: str, messages: list[Message], validate: bool = False
+    ) -> ChatCompletionResponse:
+        """
+        Sends a request to the LLM to get a chat completion without blocking the event loop.
+
+        Args:
+            model: The name of the model to use for the completion.
+            messages: A list of message dictionaries, each with a 'role' and 'content'.
+            validate: Validate the messages before sending. Only needed when they are passed as raw
+                dictionaries; Message instances are already valid.
+
+        Returns:
+            A ChatCompletionResponse object with the LLM's reply.
+        """
+        try:
+            # Build the request body, validating it first if asked to
+            payload = _build_payload(model, messages, validate=validate)
+
+            # Make the API call
+            response = await self._client.post(_COMPLETIONS_ENDPOINT, content=payload)
             response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
 
-            # Validate the response data
-            response_data = response.json()
-            return ChatCompletionResponse.model_validate(response_data)
+            # Parse and validate the response bytes in a single pass
+            return ChatCompletionResponse.model_validate_json(response.content)
 
-        except ValidationError as e:
-            print(f"Data validation error: {e}")
+        except ValidationError:
+            logger.exception("Data validation error")
             raise
-        except requests.exceptions.RequestException as e:
-            print(f"HTTP request failed: {e}")
+        except httpx.HTTPError:
+            logger.exception("HTTP request failed")
             raise
+
+    async def get_completions(
+        self, batch: list[tuple[str, list[Message]]], concurrency: int = 8
+    ) -> list[ChatCompletionResponse]:
+        """
+        Sends several completion requests concurrently.
+
+        Args:
+            batch: A list of (model, messages) pairs, one per completion.
+            concurrency: The maximum number of requests in flight at the same time.
+
+        Returns:
+            The ChatCompletionResponse objects, in the same order as the batch.
+
+        Raises:
+            ValueError: If concurrency is less than 1.
+        """
+        # A semaphore of size 0 is never released, so gather would wait forever
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")  # noqa: TRY003
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(model: str, messages: list[Message]) -> ChatCompletionResponse:
+            async with semaphore:
+                return await self.get_completion(model, messages)
+
+        return list(await asyncio.gather(*(limited(model, messages) for model, messages in batch)))
+
+    async def aclose(self) -> None:
+        """
+        Closes the underlying HTTP connection pool.
+        """
+        await self._client.aclose()
+
+    async def __aenter__(self) -> "AsyncLLMClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
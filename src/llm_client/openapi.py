@@ -0,0 +1,81 @@
+from functools import lru_cache
+from typing import Any
+
+# --- OpenAPI Specification ---
+# This is a simplified representation of what you'd find in a real openapi.json file.
+# It defines the expected request and response structures for our LLM endpoint.
+# The client never reads it at runtime, so it is only built the first time it is requested.
+
+
+@lru_cache(maxsize=1)
+def get_openapi_spec() -> dict[str, Any]:
+    """
+    Returns the OpenAPI specification of the LLM endpoint as a Python dictionary.
+
+    The dictionary is built on first use and cached; treat it as read-only.
+    """
+    return {
+        "openapi": "3.0.0",
+        "info": {"title": "Simple LLM API", "version": "1.0.0"},
+        "paths": {
+            "/v1/chat/completions": {
+                "post": {
+                    "summary": "Create a chat completion",
+                    "requestBody": {
+                        "content": {
+                            "application/json": {"schema": {"$ref": "#/components/schemas/ChatCompletionRequest"}}
+                        }
+                    },
+                    "responses": {
+                        "200": {
+                            "description": "Successful response",
+                            "content": {
+                                "application/json": {"schema": {"$ref": "#/components/schemas/ChatCompletionResponse"}}
+                            },
+                        }
+                    },
+                }
+            }
+        },
+        "components": {
+            "schemas": {
+                "ChatCompletionRequest": {
+                    "type": "object",
+                    "properties": {
+                        "model": {"type": "string"},
+                        "messages": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {"role": {"type": "string"}, "content": {"type": "string"}},
+                            },
+                        },
+                        "stream": {"type": "boolean"},
+                    },
+                    "required": ["model", "messages"],
+                },
+                "ChatCompletionResponse": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "string"},
+                        "object": {"type": "string"},
+                        "created": {"type": "integer"},
+                        "model": {"type": "string"},
+                        "choices": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "index": {"type": "integer"},
+                                    "message": {
+                                        "type": "object",
+                                        "properties": {"role": {"type": "string"}, "content": {"type": "string"}},
+                                    },
+                                },
+                            },
+                        },
+                    },
+                },
+            }
+        },
+    }
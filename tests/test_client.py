@@ -1,11 +1,29 @@
+import asyncio
+import json
 import os
 import unittest
-from unittest.mock import Mock, patch
+from http.client import HTTPMessage
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
 
+import httpx
 import requests
+import urllib3
 from dotenv import load_dotenv
+from pydantic import ValidationError
+from requests.adapters import HTTPAdapter
+from requests.cookies import extract_cookies_to_jar
+from urllib3 import HTTPConnectionPool
 
-from llm_client.client import ChatCompletionResponse, LLMClient, Message
+from llm_client.client import (
+    AsyncLLMClient,
+    ChatCompletionChunk,
+    ChatCompletionResponse,
+    LLMClient,
+    Message,
+    _build_payload,
+)
+from llm_client.openapi import get_openapi_spec
 
 # -- lade umgebungsvariablen ---
 
@@ -14,12 +32,31 @@ load_dotenv()
 # --- Tests für den LLMClient ---
 
 
+def _completion_data(content):
+    """Erzeugt die JSON-Daten einer Chat-Vervollständigung mit der angegebenen Nachricht."""
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 1677652288,
+        "model": "gpt-3.5-turbo-0613",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+    }
+
+
 class TestLLMClient(unittest.TestCase):
     def setUp(self):
         """Richtet den Test-Client vor jedem Test ein."""
         self.client = LLMClient(base_url=os.getenv("API_URL", "about:blank"), api_key=os.getenv("API_KEY", "fake-key"))
 
-    @patch("requests.post")
+    @staticmethod
+    def _response(content="Dies ist eine Testantwort."):
+        """Erzeugt eine simulierte erfolgreiche Antwort mit der angegebenen Nachricht."""
+        mock_response = Mock()
+        mock_response.raise_for_status.return_value = None
+        mock_response.content = json.dumps(_completion_data(content)).encode()
+        return mock_response
+
+    @patch("requests.Session.post")
     def test_get_completion_success(self, mock_post):
         """Testet einen erfolgreichen Aufruf zur Chat-Vervollständigung."""
         # Konfigurieren der simulierten Antwort
@@ -40,7 +77,7 @@ class TestLLMClient(unittest.TestCase):
         }
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.json.return_value = mock_response_data
+        mock_response.content = json.dumps(mock_response_data).encode()
         mock_response.raise_for_status.return_value = None  # Simuliert eine erfolgreiche Anfrage
         mock_post.return_value = mock_response
 
@@ -53,8 +90,90 @@ class TestLLMClient(unittest.TestCase):
         self.assertEqual(completion.id, "chatcmpl-test")
         self.assertEqual(completion.choices[0].message.content, "Dies ist eine Testantwort.")
         mock_post.assert_called_once()
+        self.assertEqual(mock_post.call_args.kwargs["timeout"], (10.0, 200.0))
+        self.assertIsInstance(mock_post.call_args.kwargs["data"], bytes)
+
+    @patch("requests.Session.post")
+    def test_get_completion_raw(self, mock_post):
+        """Testet, dass die Rohantwort unverändert zurückgegeben wird."""
+        mock_post.return_value = self._response()
+
+        messages = [Message(role="user", content="Hallo")]
+        raw = self.client.get_completion_raw(model="gpt-3.5-turbo", messages=messages)
+
+        self.assertIs(raw, mock_post.return_value.content)
+        mock_post.return_value.raise_for_status.assert_called_once()
+
+    @patch("requests.Session.post")
+    def test_get_completion_uses_cache(self, mock_post):
+        """Testet, dass identische Anfragen aus dem Cache beantwortet werden."""
+        mock_post.return_value = self._response()
+
+        messages = [Message(role="user", content="Hallo")]
+        cached = LLMClient(base_url="https://llm.test", api_key="fake-key", cache_size=16)
+        first = cached.get_completion(model="gpt-3.5-turbo", messages=messages)
+        second = cached.get_completion(model="gpt-3.5-turbo", messages=[Message(role="user", content="Hallo")])
+        self.assertEqual(first, second)
+        self.assertEqual(mock_post.call_count, 1)
+
+        # Jeder Treffer liefert eine eigene Kopie, Änderungen an einer Antwort wirken sich nicht auf spätere aus
+        second.choices.clear()
+        third = cached.get_completion(model="gpt-3.5-turbo", messages=messages)
+        self.assertEqual(third.choices[0].message.content, "Dies ist eine Testantwort.")
+        self.assertEqual(mock_post.call_count, 1)
+
+        cached.cache_clear()
+        cached.get_completion(model="gpt-3.5-turbo", messages=messages)
+        self.assertEqual(mock_post.call_count, 2)
+
+        # Ohne cache_size wird jede Anfrage gesendet, damit erneutes Sampling möglich bleibt
+        self.client.get_completion(model="gpt-3.5-turbo", messages=messages)
+        self.client.get_completion(model="gpt-3.5-turbo", messages=messages)
+        self.assertEqual(mock_post.call_count, 4)
+
+    @patch("requests.Session.post")
+    def test_shared_session(self, mock_post):
+        """Testet, dass Clients mit gemeinsamer Session denselben Verbindungspool nutzen."""
+        self.addCleanup(LLMClient.close_shared_session)
+        mock_post.return_value = self._response()
+        first = LLMClient(base_url="https://llm.test", api_key="key-1", shared_session=True)
+        second = LLMClient(base_url="https://llm.test", api_key="key-2", shared_session=True)
+        self.assertIs(first._session, second._session)
 
-    @patch("requests.post")
+        second.get_completion(model="gpt-3.5-turbo", messages=[Message(role="user", content="Hallo")])
+        self.assertEqual(mock_post.call_args.kwargs["headers"]["Authorization"], "Bearer key-2")
+        self.assertNotIn("Authorization", second._session.headers)
+
+        old_session = first._session
+        with patch.object(old_session, "close") as mock_close:
+            first.close()
+            mock_close.assert_not_called()
+            LLMClient.close_shared_session()
+            mock_close.assert_called_once()
+
+        # Bestehende Clients verwenden danach die neu erzeugte gemeinsame Session
+        self.assertIsNot(first._session, old_session)
+        self.assertIs(first._session, second._session)
+
+    def test_shared_session_rejects_cookies(self):
+        """Testet, dass die gemeinsame Session keine Cookies zwischen API-Schlüsseln weitergibt."""
+        self.addCleanup(LLMClient.close_shared_session)
+        session = LLMClient(base_url="https://llm.test", api_key="key-1", shared_session=True)._session
+
+        headers = HTTPMessage()
+        headers["Set-Cookie"] = "sticky=key-1; Path=/"
+        raw_response = Mock(_original_response=Mock(msg=headers))
+        request = requests.Request("POST", "https://llm.test/v1/chat/completions").prepare()
+        extract_cookies_to_jar(session.cookies, request, raw_response)
+
+        self.assertEqual(len(session.cookies), 0)
+
+    def test_completions_url_ignores_trailing_slash(self):
+        """Testet, dass ein abschließender Schrägstrich in der Basis-URL keinen doppelten Pfad erzeugt."""
+        client = LLMClient(base_url="https://llm.test/", api_key="fake-key")
+        self.assertEqual(client._completions_url, "https://llm.test/v1/chat/completions")
+
+    @patch("requests.Session.post")
     def test_get_completion_http_error(self, mock_post):
         """Testet die Behandlung eines HTTP-Fehlers."""
         # Konfigurieren des Mocks, um einen HTTPError auszulösen
@@ -62,11 +181,177 @@ class TestLLMClient(unittest.TestCase):
         mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError("404 Not Found")
         mock_post.return_value = mock_response
 
-        # Überprüfen, ob die richtige Ausnahme ausgelöst wird
-        with self.assertRaises(requests.exceptions.RequestException):
+        # Überprüfen, ob die richtige Ausnahme ausgelöst und protokolliert wird
+        with self.assertRaises(requests.exceptions.RequestException), self.assertLogs("llm_client.client", "ERROR"):
             messages = [Message(role="user", content="Hallo")]
             self.client.get_completion(model="gpt-3.5-turbo", messages=messages)
 
+    @patch("requests.Session.post")
+    def test_get_completion_invalid_messages(self, mock_post):
+        """Testet, dass ungültige Nachrichten vor dem Senden abgelehnt werden."""
+        # Rohe Dictionaries, wie sie Aufrufer ohne Message-Objekte übergeben
+        messages: list[Any] = [{"role": "user"}]
+        with self.assertRaises(ValidationError):
+            self.client.get_completion(model="gpt-3.5-turbo", messages=messages, validate=True)
+        mock_post.assert_not_called()
+
+    @patch("requests.Session.post")
+    def test_get_completions_keeps_order(self, mock_post):
+        """Testet, dass gebündelte Anfragen in der ursprünglichen Reihenfolge zurückkommen."""
+
+        def respond(url, data, **kwargs):
+            return self._response(json.loads(data)["messages"][0]["content"])
+
+        mock_post.side_effect = respond
+
+        batch = [("gpt-3.5-turbo", [Message(role="user", content=str(i))]) for i in range(5)]
+        completions = self.client.get_completions(batch, concurrency=2)
+
+        self.assertEqual([c.choices[0].message.content for c in completions], ["0", "1", "2", "3", "4"])
+        self.assertEqual(mock_post.call_count, 5)
+
+    @patch("requests.Session.post")
+    def test_stream_completion(self, mock_post):
+        """Testet, dass gestreamte Antworten Stück für Stück geliefert werden."""
+
+        def event(content):
+            chunk = {
+                "id": "chatcmpl-test",
+                "object": "chat.completion.chunk",
+                "created": 1677652288,
+                "model": "gpt-3.5-turbo-0613",
+                "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}],
+            }
+            return b"data: " + json.dumps(chunk).encode()
+
+        mock_response = MagicMock()
+        mock_response.__enter__.return_value = mock_response
+        mock_response.raise_for_status.return_value = None
+        mock_response.iter_lines.return_value = [event("Dies ist "), b"", event("eine Testantwort."), b"data: [DONE]"]
+        mock_post.return_value = mock_response
+
+        messages = [Message(role="user", content="Hallo")]
+        chunks = list(self.client.stream_completion(model="gpt-3.5-turbo", messages=messages))
+
+        self.assertTrue(all(isinstance(chunk, ChatCompletionChunk) for chunk in chunks))
+        self.assertEqual(
+            "".join(chunk.choices[0].delta.content or "" for chunk in chunks), "Dies ist eine Testantwort."
+        )
+        self.assertTrue(json.loads(mock_post.call_args.kwargs["data"])["stream"])
+        self.assertTrue(mock_post.call_args.kwargs["stream"])
+
+    def test_retries_rate_limited_requests(self):
+        """Testet, dass 429-, 500- und 503-Antworten mit Backoff wiederholt werden, Gateway-Fehler aber nicht."""
+        adapter = self.client._session.get_adapter("https://llm.test")
+        assert isinstance(adapter, HTTPAdapter)
+        retry = adapter.max_retries
+        self.assertEqual(retry.total, 3)
+        self.assertIn(429, retry.status_forcelist)
+        self.assertTrue(retry.is_retry("POST", 503, has_retry_after=True))
+        self.assertFalse(retry.is_retry("POST", 502))
+        self.assertFalse(retry.is_retry("POST", 504))
+
+    @patch("urllib3.connectionpool.HTTPConnectionPool._make_request")
+    def test_read_timeout_is_not_retried(self, mock_make_request):
+        """Testet, dass eine Zeitüberschreitung beim Lesen die Anfrage nicht erneut sendet."""
+        mock_make_request.side_effect = urllib3.exceptions.ReadTimeoutError(
+            HTTPConnectionPool("llm.test"), "/v1/chat/completions", "timed out"
+        )
+        client = LLMClient(base_url="http://llm.test", api_key="fake-key")
+
+        with self.assertRaises(requests.exceptions.ReadTimeout), self.assertLogs("llm_client.client", "ERROR"):
+            client.get_completion(model="gpt-3.5-turbo", messages=[Message(role="user", content="Hallo")])
+        self.assertEqual(mock_make_request.call_count, 1)
+
+    def test_build_payload_paths_match(self):
+        """Testet, dass der schnelle und der validierende Weg denselben Anfragetext erzeugen."""
+        messages = [
+            Message(role="system", content="Antworte kurz."),
+            Message(role="user", content='Grüße aus Köln \u2013 "zitiert" \\ 🚀'),
+        ]
+        for stream in (False, True):
+            with self.subTest(stream=stream):
+                fast = _build_payload("gpt-3.5-turbo", messages, stream=stream)
+                validated = _build_payload("gpt-3.5-turbo", messages, stream=stream, validate=True)
+                self.assertEqual(fast, validated)
+                self.assertEqual("stream" in json.loads(fast), stream)
+
+    def test_message_is_immutable(self):
+        """Testet, dass Nachrichten nach dem Erstellen nicht verändert werden können."""
+        message = Message(role="user", content="Hallo")
+        with self.assertRaises(ValidationError):
+            message.content = "Tschüss"  # ty: ignore[invalid-assignment]
+
+    def test_openapi_spec_is_cached(self):
+        """Testet, dass die OpenAPI-Spezifikation nur einmal erzeugt wird."""
+        spec = get_openapi_spec()
+        self.assertIs(spec, get_openapi_spec())
+        self.assertIn("/v1/chat/completions", spec["paths"])
+
+
+class TestAsyncLLMClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        """Richtet den asynchronen Test-Client vor jedem Test ein."""
+        self.client = AsyncLLMClient(base_url="http://llm.test", api_key="fake-key")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    @staticmethod
+    def _response(status_code, content):
+        """Erzeugt eine httpx-Antwort mit der angegebenen Nachricht."""
+        return httpx.Response(
+            status_code, json=_completion_data(content), request=httpx.Request("POST", "http://llm.test")
+        )
+
+    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    async def test_get_completion_success(self, mock_post):
+        """Testet einen erfolgreichen asynchronen Aufruf."""
+        mock_post.return_value = self._response(200, "Dies ist eine Testantwort.")
+
+        messages = [Message(role="user", content="Hallo")]
+        completion = await self.client.get_completion(model="gpt-3.5-turbo", messages=messages)
+
+        self.assertIsInstance(completion, ChatCompletionResponse)
+        self.assertEqual(completion.choices[0].message.content, "Dies ist eine Testantwort.")
+        mock_post.assert_awaited_once()
+        self.assertIsInstance(mock_post.call_args.kwargs["content"], bytes)
+
+    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    async def test_get_completion_http_error(self, mock_post):
+        """Testet die Behandlung eines HTTP-Fehlers im asynchronen Client."""
+        mock_post.return_value = self._response(503, "")
+
+        with self.assertRaises(httpx.HTTPStatusError):
+            messages = [Message(role="user", content="Hallo")]
+            await self.client.get_completion(model="gpt-3.5-turbo", messages=messages)
+
+    @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+    async def test_get_completions_keeps_order(self, mock_post):
+        """Testet, dass gebündelte Anfragen in der ursprünglichen Reihenfolge zurückkommen."""
+        mock_post.side_effect = [self._response(200, str(i)) for i in range(5)]
+
+        batch = [("gpt-3.5-turbo", [Message(role="user", content=str(i))]) for i in range(5)]
+        completions = await self.client.get_completions(batch, concurrency=2)
+
+        self.assertEqual([c.choices[0].message.content for c in completions], ["0", "1", "2", "3", "4"])
+        self.assertEqual(mock_post.await_count, 5)
+
+    async def test_http2(self):
+        """Testet, dass HTTP/2 an den httpx-Client weitergegeben wird."""
+        with patch("httpx.AsyncClient", wraps=httpx.AsyncClient) as mock_client:
+            client = AsyncLLMClient(base_url="https://llm.test", api_key="fake-key", http2=True)
+        self.addAsyncCleanup(client.aclose)
+
+        self.assertTrue(mock_client.call_args.kwargs["http2"])
+        self.assertIsInstance(client._client, httpx.AsyncClient)
+
+    async def test_get_completions_rejects_zero_concurrency(self):
+        """Testet, dass eine Nebenläufigkeit kleiner als 1 abgelehnt wird, statt ewig zu warten."""
+        batch = [("gpt-3.5-turbo", [Message(role="user", content="Hallo")])]
+        with self.assertRaises(ValueError):
+            await asyncio.wait_for(self.client.get_completions(batch, concurrency=0), timeout=1)
+
 
 if __name__ == "__main__":
     # Führt die Tests aus, wenn das Skript direkt gestartet wird.